@@ -56,11 +56,13 @@ PLATFORM_CONFIG = {
     },
     'PlayStation': {
         'csv': 'Sony - PlayStation.csv',
-        'extensions': ['.bin', '.cue', '.img', '.mdf', '.pbp', '.toc', '.cbn', '.m3u']
+        'extensions': ['.bin', '.cue', '.img', '.mdf', '.pbp', '.toc', '.cbn', '.m3u'],
+        'multi_file': True  # 多碟/多文件镜像按集合处理
     },
     'Dreamcast': {
         'csv': 'Sega - Dreamcast.csv',
-        'extensions': ['.cdi', '.gdi', '.chd']
+        'extensions': ['.cdi', '.gdi', '.chd', '.m3u'],
+        'multi_file': True
     },
     'Mega Drive': {
         'csv': 'Sega - Mega Drive - Genesis.csv',
@@ -80,4 +82,68 @@ MATCH_WEIGHTS = {
 LENGTH_RATIO_POWER = 0.5
 
 # 子串惩罚系数
-SUBSTRING_PENALTY = 0.7
\ No newline at end of file
+SUBSTRING_PENALTY = 0.7
+
+# 区域标签（No-Intro英文名括号内容），每个标签占一个比特位
+REGION_TAGS = [
+    'Japan', 'USA', 'Europe', 'World', 'Asia', 'China', 'Taiwan', 'Hong Kong', 'Korea',
+    'Australia', 'Canada', 'Brazil', 'Latin America', 'Mexico', 'UK', 'France', 'Germany',
+    'Spain', 'Italy', 'Netherlands', 'Portugal', 'Greece', 'Poland', 'Russia', 'India',
+    'Scandinavia', 'Sweden', 'Norway', 'Denmark', 'Finland',
+]
+
+# 语言标签
+LANGUAGE_TAGS = [
+    'En', 'Ja', 'Fr', 'De', 'Es', 'It', 'Nl', 'Pt', 'Sv', 'No', 'Da', 'Fi',
+    'Pl', 'Ru', 'El', 'Zh', 'Ko',
+]
+
+# 标签别名：别名 -> 标准标签
+TAG_ALIASES = {
+    'United Kingdom': 'UK',
+    'U': 'USA',
+    'J': 'Japan',
+    'E': 'Europe',
+    'W': 'World',
+    'Chinese': 'Zh',
+    'CN': 'China',
+}
+
+# 平台自动检测：抽样数量、每批数量、高置信度分数、最少命中数
+DETECT_SAMPLE_SIZE = 60
+DETECT_BATCH_SIZE = 10
+DETECT_MIN_SCORE = 85
+DETECT_MIN_HITS = 5
+
+# RetroArch缩略图类型目录
+THUMBNAIL_TYPES = ['Named_Boxarts', 'Named_Snaps', 'Named_Titles']
+
+# RetroArch缩略图文件名中会被替换为'_'的字符
+THUMBNAIL_INVALID_CHARS = '&*/:`<>?\\|"'
+
+# 监视模式：写入完成后的稳定等待(秒)、轮询间隔(秒)、日志文件及轮转设置
+WATCH_DEBOUNCE = 2.0
+WATCH_SETTLE = 0.05
+WATCH_POLL_INTERVAL = 1.0
+# 多文件集合:缺少cue/gdi/m3u或被引用文件时最多等待(秒),以及需要列表文件的镜像扩展名
+WATCH_SET_TIMEOUT = 30.0
+WATCH_NEEDS_SHEET = ['.bin', '.img', '.raw']
+WATCH_LOG_FILE = 'watcher.log'
+WATCH_LOG_MAX_BYTES = 5 * 1024 * 1024
+WATCH_LOG_BACKUPS = 3
+
+# 本地查询服务：监听地址、端口、延迟统计窗口
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8765
+SERVER_LATENCY_WINDOW = 1000
+
+# 运行分析：报告目录、是否启用cProfile/tracemalloc(开销较大,默认关闭)
+PROFILE_REPORT_DIR = 'reports'
+PROFILE_CPROFILE = False
+PROFILE_TRACEMALLOC = False
+
+# 进度刷新最小间隔(秒)
+PROGRESS_INTERVAL = 0.25
+
+# cue/gdi/m3u列表文件的候选编码(依次尝试,最后再尝试系统默认编码)
+SHEET_ENCODINGS = ['utf-8', 'gbk']
@@ -4,10 +4,34 @@ ROM Renamer - 核心功能模块
 """
 import os
 import re
+import random
+import locale
+import shutil
+import tempfile
 from pathlib import Path
+import numpy as np
 import pandas as pd
 from rapidfuzz import process, fuzz
-from config import PLATFORM_CONFIG, CSV_ROOT_DIR, MATCH_WEIGHTS, LENGTH_RATIO_POWER, SUBSTRING_PENALTY
+from config import (PLATFORM_CONFIG, CSV_ROOT_DIR, MATCH_WEIGHTS, LENGTH_RATIO_POWER, SUBSTRING_PENALTY,
+                    REGION_TAGS, LANGUAGE_TAGS, TAG_ALIASES,
+                    DETECT_SAMPLE_SIZE, DETECT_BATCH_SIZE, DETECT_MIN_SCORE, DETECT_MIN_HITS,
+                    THUMBNAIL_TYPES, THUMBNAIL_INVALID_CHARS, SHEET_ENCODINGS)
+
+# 标签比特位：区域在低位，语言在高位
+TAG_BITS = {tag: 1 << i for i, tag in enumerate(REGION_TAGS + LANGUAGE_TAGS)}
+REGION_MASK = sum(TAG_BITS[t] for t in REGION_TAGS)
+LANGUAGE_MASK = sum(TAG_BITS[t] for t in LANGUAGE_TAGS)
+WORLD_BIT = TAG_BITS['World']
+
+# 所有平台合并索引的缓存键
+COMBINED_KEY = '__combined__'
+
+# 碟号/音轨标签,如 (Disc 1)、[CD2]、- Disc 3、(Track 02)
+DISC_TAG_RE = re.compile(r'\s*[\(\[]\s*(?:Disc|Disk|CD|Track)\s*\d+(?:\s*of\s*\d+)?\s*[\)\]]'
+                         r'|\s*[-_]?\s*\b(?:Disc|Disk|CD)\s*\d+\b', re.IGNORECASE)
+
+# 引用其他镜像文件的列表文件
+SHEET_EXTENSIONS = ('.m3u', '.cue', '.gdi')
 
 
 class CSVMapper:
@@ -30,6 +54,12 @@ class CSVMapper:
             return []
         return PLATFORM_CONFIG[platform_name]['extensions']
     
+    def is_multi_file(self, platform_name):
+        """平台是否按多碟/多文件集合处理"""
+        if platform_name not in PLATFORM_CONFIG:
+            return False
+        return PLATFORM_CONFIG[platform_name].get('multi_file', False)
+    
     def load_mapping(self, csv_path):
         """加载CSV映射(带缓存)"""
         if csv_path not in self.cache:
@@ -39,14 +69,86 @@ class CSVMapper:
                     raise ValueError("CSV必须至少包含两列")
                 df = df.fillna("")
                 eng, cn = df.iloc[:, 0].tolist(), df.iloc[:, 1].tolist()
+                eng_to_cn = {e: c for e, c in zip(eng, cn) if c}
+                eng_list = list(eng_to_cn)
+                eng_clean = [FileNameCleaner.clean(e) for e in eng_list]
+                eng_variants = {}
+                for i, c in enumerate(eng_clean):
+                    eng_variants.setdefault(c, []).append(i)
                 self.cache[csv_path] = {
                     'cn_to_eng': {c: e for e, c in zip(eng, cn) if c},
-                    'eng_to_cn': {e: c for e, c in zip(eng, cn) if c},
-                    'cn_list': [c for c in cn if c]
+                    'eng_to_cn': eng_to_cn,
+                    'cn_list': [c for c in cn if c],
+                    # 按行预计算的列：英文名、清理后英文名、区域/语言标签掩码
+                    'eng_list': eng_list,
+                    'eng_clean': eng_clean,
+                    'eng_tags': np.fromiter((FileNameCleaner.extract_tags(e) for e in eng_list),
+                                            dtype=np.uint64, count=len(eng_list)),
+                    # 清理后英文名 -> 各区域版本的行下标
+                    'eng_variants': {c: np.array(rows, dtype=np.intp) for c, rows in eng_variants.items()}
                 }
             except Exception as e:
                 raise ValueError(f"读取CSV失败: {e}")
         return self.cache[csv_path]
+    
+    def load_combined_index(self):
+        """加载所有平台CSV的合并索引(带缓存),每个平台占一段连续区间"""
+        if COMBINED_KEY not in self.cache:
+            platforms, cn_names, eng_names, cn_offsets, eng_offsets = [], [], [], [], []
+            for platform_name in PLATFORM_CONFIG:
+                csv_path = self.get_csv_path(platform_name)
+                if not csv_path:
+                    continue
+                mapping = self.load_mapping(csv_path)
+                if not mapping['cn_list'] or not mapping['eng_list']:
+                    continue
+                platforms.append(platform_name)
+                cn_offsets.append(len(cn_names))
+                cn_names.extend(FileNameCleaner.clean(c) for c in mapping['cn_list'])
+                eng_offsets.append(len(eng_names))
+                eng_names.extend(mapping['eng_clean'])
+            self.cache[COMBINED_KEY] = {
+                'platforms': platforms,
+                'cn': {'names': cn_names, 'offsets': np.array(cn_offsets, dtype=np.intp)},
+                'eng': {'names': eng_names, 'offsets': np.array(eng_offsets, dtype=np.intp)}
+            }
+        return self.cache[COMBINED_KEY]
+    
+    @staticmethod
+    def prefer_tagged_variant(mapping, index, tags):
+        """在与index同名的各区域版本中优先选择标签兼容的行
+        
+        标签只用于挑选同一游戏的区域版本,不剔除候选,CSV缺少该区域版本时保持原匹配
+        """
+        if not tags or index is None:
+            return index
+        variants = mapping['eng_variants'][mapping['eng_clean'][index]]
+        if len(variants) < 2:
+            return index
+        row_tags = mapping['eng_tags'][variants]
+        # 兼容版本中共同标签越多越优先,不兼容的版本不参与
+        shared = np.array([bin(int(t) & tags).count('1') for t in row_tags])
+        shared[~_tags_compatible(row_tags, tags)] = -1
+        best = shared.max()
+        if best < 0 or shared[variants == index][0] == best:
+            return index
+        return int(variants[shared.argmax()])
+
+
+def _tags_compatible(row_tags, tags):
+    """各行标签是否与tags兼容,返回布尔数组"""
+    keep = np.ones(len(row_tags), dtype=bool)
+    region = np.uint64(tags & REGION_MASK)
+    if region:
+        # 区域：有交集、World版本或未标注区域的行都兼容
+        row_region = row_tags & np.uint64(REGION_MASK)
+        keep &= ((row_region & (region | np.uint64(WORLD_BIT))) != 0) | (row_region == 0)
+    language = np.uint64(tags & LANGUAGE_MASK)
+    if language:
+        # 语言：未标注语言的行视为兼容
+        row_language = row_tags & np.uint64(LANGUAGE_MASK)
+        keep &= ((row_language & language) != 0) | (row_language == 0)
+    return keep
 
 
 class FileNameCleaner:
@@ -76,6 +178,19 @@ class FileNameCleaner:
         name = re.sub(r'\s+', '', name)  # 移除所有空格
         name = name.strip()
         return re.sub(r'Advance', 'A', name, flags=re.IGNORECASE)
+    
+    @staticmethod
+    def extract_tags(name):
+        """提取括号中的区域/语言标签,返回比特掩码"""
+        tags = 0
+        for group in re.findall(r'[\[\(]([^\]\)]*)[\]\)]', name):
+            for tag in group.split(','):
+                tag = tag.strip()
+                tag = TAG_ALIASES.get(tag, tag)
+                if tag not in TAG_BITS:
+                    tag = tag.split('-')[0]  # 如 Fr-CA、Zh-Hans
+                tags |= TAG_BITS.get(tag, 0)
+        return tags
 
 
 class SmartMatcher:
@@ -83,13 +198,19 @@ class SmartMatcher:
     @staticmethod
     def match(query, choices, threshold):
         """多策略智能匹配"""
+        index, score = SmartMatcher.match_index(query, choices, threshold)
+        return (choices[index] if index is not None else None), score
+    
+    @staticmethod
+    def match_index(query, choices, threshold):
+        """多策略智能匹配,返回(候选下标, 分数)"""
         if not query or not choices:
             return None, 0
         
         candidates = process.extract(query, choices, scorer=fuzz.token_set_ratio, limit=5)
-        best_match, best_score = None, 0
+        best_index, best_score = None, 0
         
-        for candidate, token_score, *_ in candidates:
+        for candidate, token_score, index in candidates:
             # 综合多种匹配策略
             scores = [
                 fuzz.token_set_ratio(query, candidate),
@@ -116,19 +237,365 @@ class SmartMatcher:
                 composite *= SUBSTRING_PENALTY
             
             if composite > best_score:
-                best_score, best_match = composite, candidate
+                best_score, best_index = composite, index
         
-        return (best_match, best_score) if best_score >= threshold else (None, best_score)
+        return (best_index, best_score) if best_score >= threshold else (None, best_score)
+    
+    @staticmethod
+    def match_eng(name, mapping, threshold):
+        """英文名匹配(与清理后英文名多策略匹配,同名时优先标签兼容的区域版本),返回(英文名, 分数)"""
+        index, score = SmartMatcher.match_index(FileNameCleaner.clean(name), mapping['eng_clean'], threshold)
+        index = CSVMapper.prefer_tagged_variant(mapping, index, FileNameCleaner.extract_tags(name))
+        return (mapping['eng_list'][index] if index is not None else None), score
+    
+    @staticmethod
+    def translate(name, mapping, direction, threshold):
+        """按方向(cn2en/en2cn)翻译名称,返回(译名, 匹配项, 分数),未匹配时译名为None"""
+        if direction == 'cn2en':
+            match, score = SmartMatcher.match(FileNameCleaner.clean(name), mapping['cn_list'], threshold)
+            return (mapping['cn_to_eng'].get(match) if match else None), match, score
+        if direction == 'en2cn':
+            match, score = SmartMatcher.match_eng(name, mapping, threshold)
+            return (mapping['eng_to_cn'].get(match) if match else None), match, score
+        raise ValueError(f"未知的翻译方向: {direction}")
+    
+    @staticmethod
+    def match_label(label, mapping, threshold):
+        """列表标签匹配中文名(同名时优先标签兼容的区域版本),返回(中文名, 分数)"""
+        cleaned = FileNameCleaner.clean(label)
+        best, best_score = None, 0
+        for i, eng in enumerate(mapping['eng_clean']):
+            score = fuzz.token_set_ratio(cleaned, eng)
+            if score > best_score:
+                best, best_score = i, score
+        best = CSVMapper.prefer_tagged_variant(mapping, best, FileNameCleaner.extract_tags(label))
+        if best is None or best_score < threshold:
+            return None, best_score
+        return mapping['eng_to_cn'][mapping['eng_list'][best]], best_score
+
+
+def detect_platform(mapper, folder, min_score=DETECT_MIN_SCORE, cancel=None):
+    """抽样检测文件夹所属平台,返回(平台名, 各平台命中数, 抽样数)
+    
+    cancel(threading.Event)被置位时在下一批前停止,返回已抽样部分的结果
+    """
+    index = mapper.load_combined_index()
+    platforms = index['platforms']
+    if not platforms:
+        return None, {}, 0
+    all_extensions = {ext for name in platforms for ext in PLATFORM_CONFIG[name]['extensions']}
+    files = [f for f in os.listdir(folder)
+             if os.path.isfile(os.path.join(folder, f)) and os.path.splitext(f)[1].lower() in all_extensions]
+    random.shuffle(files)
+    files = files[:DETECT_SAMPLE_SIZE]
+    
+    hits = dict.fromkeys(platforms, 0)
+    sampled = 0
+    for start in range(0, len(files), DETECT_BATCH_SIZE):
+        if cancel is not None and cancel.is_set():
+            break
+        batch = files[start:start + DETECT_BATCH_SIZE]
+        sampled += len(batch)
+        
+        # 按中/英文分组,每组对合并索引做一次批量打分
+        groups = {'cn': [], 'eng': []}
+        for filename in batch:
+            name, ext = os.path.splitext(filename)
+            cleaned = FileNameCleaner.clean(name)
+            if cleaned:
+                groups['cn' if is_chinese_filename(name) else 'eng'].append((cleaned, ext.lower()))
+        
+        for key, group in groups.items():
+            if not group:
+                continue
+            scores = process.cdist([q for q, _ in group], index[key]['names'],
+                                   scorer=fuzz.ratio, dtype=np.uint8, workers=-1)
+            # 每个平台区间内的最高分 -> (文件数, 平台数)
+            best = np.maximum.reduceat(scores, index[key]['offsets'], axis=1)
+            for (_, ext), row in zip(group, best):
+                allowed = np.array([ext in PLATFORM_CONFIG[p]['extensions'] for p in platforms])
+                row = np.where(allowed, row, 0)
+                top = row.max()
+                if top >= min_score:
+                    for i in np.flatnonzero(row == top):
+                        hits[platforms[i]] += 1
+        
+        # 领先优势无法被剩余样本追平,或符号检验已显著(约95%)则提前结束
+        ranking = sorted(hits.values(), reverse=True)
+        lead, second = ranking[0], ranking[1] if len(ranking) > 1 else 0
+        if lead - second > len(files) - sampled:
+            break
+        if lead >= DETECT_MIN_HITS and lead - second >= 2 * (lead + second) ** 0.5:
+            break
+    
+    best_platform = max(hits, key=hits.get)
+    return (best_platform if hits[best_platform] else None), hits, sampled
+
+
+def strip_disc_tags(name):
+    """移除碟号/音轨标签"""
+    return DISC_TAG_RE.sub('', name).strip()
+
+
+def _split_reference(line, ext):
+    """把列表文件的一行拆分为(前缀, 引用文件名, 后缀),无引用返回None"""
+    body = line.rstrip('\r\n')
+    eol = line[len(body):]
+    if ext == '.cue':
+        m = (re.match(r'(\s*FILE\s+")([^"]+)(".*)', body, re.IGNORECASE)
+             or re.match(r'(\s*FILE\s+)(\S+)(\s.*)', body, re.IGNORECASE))
+    elif ext == '.gdi':
+        m = (re.match(r'(\s*(?:\d+\s+){4}")([^"]+)(".*)', body)
+             or re.match(r'(\s*(?:\d+\s+){4})(\S+)(.*)', body))
+    elif body.strip() and not body.lstrip().startswith('#'):
+        m = re.match(r'(\s*)(.*?)(\s*)$', body)
+    else:
+        m = None
+    return (m.group(1), m.group(2), m.group(3) + eol) if m else None
+
 
+def detect_sheet_encoding(path):
+    """检测列表文件编码(依次尝试UTF-8、GBK及系统默认编码,都失败时返回None)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data.startswith(b'\xef\xbb\xbf'):
+        return 'utf-8-sig'
+    for encoding in SHEET_ENCODINGS + [locale.getpreferredencoding(False)]:
+        try:
+            data.decode(encoding)
+            return encoding
+        except (UnicodeDecodeError, LookupError):
+            continue
+    return None
 
-def generate_unique_filename(folder, filename):
-    """生成唯一文件名（避免重复）"""
-    base, ext = os.path.splitext(filename)
-    candidate, i = filename, 1
-    while os.path.exists(os.path.join(folder, candidate)):
-        candidate = f"{base} ({i}){ext}"
+
+def _open_sheet(path, mode='r', encoding=None):
+    """打开列表文件(保留原始换行,无法识别编码时保留原始字节)"""
+    return open(path, mode, encoding=encoding or 'utf-8', errors='surrogateescape', newline='')
+
+
+def _has_undecoded(text):
+    """是否含有无法解码的字节(surrogateescape产生的代理字符)"""
+    return any('\udc80' <= c <= '\udcff' for c in text)
+
+
+def _sheet_rank(filename):
+    """列表文件优先级:m3u > cue > gdi > 其他"""
+    ext = os.path.splitext(filename)[1].lower()
+    return SHEET_EXTENSIONS.index(ext) if ext in SHEET_EXTENSIONS else len(SHEET_EXTENSIONS)
+
+
+def read_sheet_references(path):
+    """读取cue/gdi/m3u中引用的同目录文件名"""
+    ext = os.path.splitext(path)[1].lower()
+    refs = []
+    with _open_sheet(path, encoding=detect_sheet_encoding(path)) as f:
+        for line in f:
+            parts = _split_reference(line, ext)
+            if parts:
+                ref = os.path.normpath(parts[1])
+                if not os.path.dirname(ref):
+                    refs.append(ref)
+    return refs
+
+
+def scan_rom_sets(folder, extensions, multi_file=False):
+    """扫描文件夹,返回(ROM集合列表, 文件总数, 错误扩展名数)
+    
+    多文件平台按共同文件名、碟号及cue/gdi/m3u引用把相关文件分为一个集合,
+    每个集合只需匹配一次。集合: {'base': 匹配用名称, 'files': 文件列表, 'label': 显示名}
+    """
+    all_files = [f for f in os.listdir(folder) if os.path.isfile(os.path.join(folder, f))]
+    valid = [f for f in all_files if os.path.splitext(f)[1].lower() in extensions]
+    
+    if not multi_file:
+        rom_sets = [{'base': os.path.splitext(f)[0], 'files': [f], 'label': f} for f in valid]
+        return rom_sets, len(all_files), len(all_files) - len(valid)
+    
+    present = {f.lower(): f for f in all_files}
+    parent = {}
+    
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+    
+    def union(a, b):
+        parent.setdefault(a, a)
+        parent.setdefault(b, b)
+        parent[find(b)] = find(a)
+    
+    by_base = {}
+    for f in valid:
+        parent.setdefault(f, f)
+        key = strip_disc_tags(os.path.splitext(f)[0]).lower()
+        if key in by_base:
+            union(by_base[key], f)
+        else:
+            by_base[key] = f
+        if os.path.splitext(f)[1].lower() in SHEET_EXTENSIONS:
+            try:
+                refs = read_sheet_references(os.path.join(folder, f))
+            except OSError:
+                continue
+            for ref in refs:
+                if ref.lower() in present:
+                    union(f, present[ref.lower()])
+    
+    groups = {}
+    for f in parent:
+        groups.setdefault(find(f), []).append(f)
+    
+    rom_sets = []
+    for files in groups.values():
+        files.sort()
+        # 优先用m3u,其次cue/gdi的文件名作为集合名称
+        primary = min(files, key=_sheet_rank)
+        base = strip_disc_tags(os.path.splitext(primary)[0])
+        label = files[0] if len(files) == 1 else f"{base} [{len(files)}个文件]"
+        rom_sets.append({'base': base, 'files': files, 'label': label})
+    return rom_sets, len(all_files), len(all_files) - len(parent)
+
+
+def plan_set_rename(folder, rom_set, title):
+    """生成集合的重命名计划 {旧文件名: 新文件名},保留碟号等后缀并整体避免重名"""
+    base = rom_set['base']
+    parts = {f: os.path.splitext(f) for f in rom_set['files']
+             if os.path.splitext(f)[0].lower().startswith(base.lower())}
+    if any(len(stem) > len(base) for stem, _ in parts.values()):
+        title = strip_disc_tags(title)  # 碟号由各文件自身后缀保留
+    i = 0
+    while True:
+        candidate = title if i == 0 else f"{title} ({i})"
+        plan = {f: candidate + stem[len(base):] + ext for f, (stem, ext) in parts.items()}
+        if not any(os.path.exists(os.path.join(folder, new)) for new in plan.values()):
+            return plan
         i += 1
-    return candidate
+
+
+def _rewrite_sheet(src, dst, plan):
+    """按原编码流式改写列表文件中的引用,返回是否有改动
+    
+    引用无法解码或新文件名无法用原编码保存时抛出ValueError,避免留下失效的引用
+    """
+    ext = os.path.splitext(src)[1].lower()
+    name = os.path.basename(src)
+    encoding = detect_sheet_encoding(src)
+    lookup = {old.lower(): new for old, new in plan.items()}
+    # 旧文件名在各候选编码下的字节,用于发现因编码误判而未被识别的引用
+    raw_names = {}
+    for old in plan:
+        for candidate in SHEET_ENCODINGS + [locale.getpreferredencoding(False)]:
+            try:
+                raw_names.setdefault(old, set()).add(old.encode(candidate))
+            except (UnicodeEncodeError, LookupError):
+                continue
+    changed = False
+    with _open_sheet(src, encoding=encoding) as fin, _open_sheet(dst, 'w', encoding=encoding) as fout:
+        for line in fin:
+            parts = _split_reference(line, ext)
+            if parts:
+                prefix, ref, suffix = parts
+                if _has_undecoded(ref):
+                    raise ValueError(f"无法识别 {name} 的编码,引用未改写")
+                ref_dir, ref_name = os.path.split(ref)
+                new = lookup.get(ref_name.lower()) if not ref_dir or ref_dir == '.' else None
+                if new:
+                    line = prefix + (os.path.join(ref_dir, new) if ref_dir else new) + suffix
+                    changed = True
+                else:
+                    raw = ref.encode(encoding or 'utf-8', errors='surrogateescape')
+                    for old, forms in raw_names.items():
+                        if any(form in raw for form in forms):
+                            raise ValueError(f"{name} 中对 {old} 的引用无法改写(编码不匹配)")
+            try:
+                fout.write(line)
+            except UnicodeEncodeError:
+                raise ValueError(f"新文件名无法以 {encoding} 编码写入 {name}")
+    shutil.copymode(src, dst)
+    return changed
+
+
+def rename_rom_set(folder, rom_set, plan):
+    """整体重命名集合:先改写cue/gdi/m3u引用到临时文件,再逐个重命名,失败时回滚
+    
+    替换列表文件时先把原文件移为备份,回滚时连同内容一并恢复
+    """
+    temps = {}
+    done = []
+    backups = []
+    try:
+        for f in rom_set['files']:
+            if os.path.splitext(f)[1].lower() not in SHEET_EXTENSIONS:
+                continue
+            fd, tmp = tempfile.mkstemp(dir=folder, suffix='.tmp')
+            os.close(fd)
+            temps[f] = tmp
+            if not _rewrite_sheet(os.path.join(folder, f), tmp, plan):
+                os.remove(temps.pop(f))
+        for old, new in plan.items():
+            os.rename(os.path.join(folder, old), os.path.join(folder, new))
+            done.append((old, new))
+        for f, tmp in temps.items():
+            sheet_path = os.path.join(folder, plan.get(f, f))
+            os.replace(sheet_path, tmp + '.bak')
+            backups.append((sheet_path, tmp + '.bak'))
+            os.replace(tmp, sheet_path)
+    except Exception:
+        for sheet_path, backup in reversed(backups):
+            os.replace(backup, sheet_path)
+        for old, new in reversed(done):
+            os.rename(os.path.join(folder, new), os.path.join(folder, old))
+        for tmp in temps.values():
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        raise
+    for _, backup in backups:
+        os.remove(backup)
+
+
+def thumbnail_name(label):
+    """按RetroArch规则把标签转为缩略图文件名"""
+    return ''.join('_' if c in THUMBNAIL_INVALID_CHARS else c for c in label) + '.png'
+
+
+def link_thumbnails(thumbnail_dir, renames):
+    """为改名后的标签批量创建缩略图硬链接(失败时退回符号链接)
+    
+    renames: [(数据库名, 旧标签, 新标签)],数据库名即thumbnails下的子目录名
+    """
+    stats = {'linked': 0, 'symlinked': 0, 'missing': 0, 'exists': 0, 'failed': 0}
+    by_db = {}
+    for db_name, old, new in renames:
+        by_db.setdefault(db_name, set()).add((thumbnail_name(old), thumbnail_name(new)))
+    
+    for db_name, pairs in by_db.items():
+        for thumb_type in THUMBNAIL_TYPES:
+            folder = Path(thumbnail_dir) / db_name / thumb_type
+            if not folder.is_dir():
+                stats['missing'] += len(pairs)
+                continue
+            # 每个目录只列举一次
+            existing = {entry.name for entry in os.scandir(folder)}
+            for old, new in pairs:
+                if old not in existing:
+                    stats['missing'] += 1
+                elif new in existing:
+                    stats['exists'] += 1
+                else:
+                    try:
+                        os.link(folder / old, folder / new)
+                        stats['linked'] += 1
+                    except OSError:
+                        try:
+                            os.symlink(old, folder / new)
+                            stats['symlinked'] += 1
+                        except OSError:
+                            stats['failed'] += 1
+                            continue
+                    existing.add(new)
+    return stats
 
 
 def is_chinese_filename(name):
@@ -8,14 +8,16 @@ import threading
 import re
 import webbrowser
 from datetime import datetime
+from contextlib import nullcontext
 from pathlib import Path
-from tkinter import Tk, Label, Entry, Button, StringVar, IntVar, filedialog, DISABLED, NORMAL, END, Frame
+from tkinter import Tk, Label, Entry, Button, Checkbutton, StringVar, IntVar, filedialog, DISABLED, NORMAL, END, Frame
 from tkinter.scrolledtext import ScrolledText
-from tkinter.ttk import Combobox
-from rapidfuzz import fuzz
+from tkinter.ttk import Combobox, Progressbar
 
 from config import APP_TITLE, DEFAULT_THRESHOLD, PLATFORM_CONFIG
-from core import CSVMapper, FileNameCleaner, SmartMatcher, generate_unique_filename, is_chinese_filename
+from core import (CSVMapper, FileNameCleaner, SmartMatcher, detect_platform, is_chinese_filename,
+                  scan_rom_sets, plan_set_rename, rename_rom_set, link_thumbnails)
+from profiler import RunProfiler, ProgressTracker
 
 
 class RenamerApp:
@@ -28,9 +30,13 @@ class RenamerApp:
         self.lpl_var = StringVar()
         self.xml_var = StringVar()
         self.threshold_var = IntVar(value=DEFAULT_THRESHOLD)
+        self.thumb_var = IntVar(value=0)
         self.platform_var = StringVar()
         self.mapper = CSVMapper()
         self.running = False
+        self.profiler = None
+        self.cancel_event = threading.Event()
+        self.progress_text = StringVar()
         
         self._build_ui()
     
@@ -48,12 +54,15 @@ class RenamerApp:
                                        state='readonly', width=18)
         self.platform_combo.grid(row=0, column=5, padx=6, pady=6)
         self.platform_combo.set('')  # 默认为空
+        self.detect_btn = Button(self.master, text="自动检测", command=self._start_detect)
+        self.detect_btn.grid(row=0, column=6, padx=6)
         
         # LPL选择
         Label(self.master, text="LPL 播放列表:").grid(row=1, column=0, sticky='w', padx=6, pady=6)
         Entry(self.master, textvariable=self.lpl_var, width=45).grid(row=1, column=1, padx=6, pady=6, columnspan=2)
         Button(self.master, text="浏览", command=lambda: self._browse(self.lpl_var, False, "lpl")).grid(row=1, column=3, padx=6)
         Button(self.master, text="转换LPL", command=self._start_lpl, width=10).grid(row=1, column=4, columnspan=2, padx=(20, 6), pady=6)
+        Checkbutton(self.master, text="关联封面", variable=self.thumb_var).grid(row=1, column=6, padx=6)
         
         # XML选择(萤火虫)
         Label(self.master, text="萤火虫列表:").grid(row=2, column=0, sticky='w', padx=6, pady=6)
@@ -79,16 +88,26 @@ class RenamerApp:
         self.eng_to_cn_btn = Button(btn_frame1, text="执行英译中", command=self._start_eng_to_cn, width=18)
         self.eng_to_cn_btn.pack(side='left', padx=3)
         
+        self.cancel_btn = Button(btn_frame1, text="取消", command=self._cancel, width=10, state=DISABLED)
+        self.cancel_btn.pack(side='left', padx=3)
+        
         Button(btn_frame1, text="清空日志", command=self._clear_log, width=10).pack(side='left', padx=3)
         
+        # 进度条
+        progress_frame = Frame(self.master)
+        progress_frame.grid(row=5, column=1, columnspan=5, sticky='we', padx=6)
+        self.progress_bar = Progressbar(progress_frame, length=360, mode='determinate', maximum=100)
+        self.progress_bar.pack(side='left')
+        Label(progress_frame, textvariable=self.progress_text, fg="gray").pack(side='left', padx=6)
+        
         # 日志区域
-        Label(self.master, text="日志/进度:").grid(row=5, column=0, sticky='nw', padx=6, pady=6)
+        Label(self.master, text="日志/进度:").grid(row=6, column=0, sticky='nw', padx=6, pady=6)
         self.log = ScrolledText(self.master, width=100, height=20, state=DISABLED)
-        self.log.grid(row=5, column=1, columnspan=5, padx=6, pady=6)
+        self.log.grid(row=6, column=1, columnspan=5, padx=6, pady=6)
         
         # 作者信息
         author_frame = Frame(self.master)
-        author_frame.grid(row=6, column=1, columnspan=5, pady=6)
+        author_frame.grid(row=7, column=1, columnspan=5, pady=6)
         Label(author_frame, text="作者:").pack(side='left')
         Button(author_frame, text="奇个旦", fg="blue", cursor="hand2", relief="flat",
                command=lambda: webbrowser.open("https://space.bilibili.com/332938511")).pack(side='left')
@@ -115,10 +134,28 @@ class RenamerApp:
     
     def _log(self, text):
         """写入日志"""
-        self.log.configure(state=NORMAL)
-        self.log.insert(END, f"[{datetime.now():%H:%M:%S}] {text}\n")
-        self.log.see(END)
-        self.log.configure(state=DISABLED)
+        with self.profiler.stage('log') if self.profiler else nullcontext():
+            self.log.configure(state=NORMAL)
+            self.log.insert(END, f"[{datetime.now():%H:%M:%S}] {text}\n")
+            self.log.see(END)
+            self.log.configure(state=DISABLED)
+    
+    def _progress(self, done, total, rate, eta):
+        """刷新进度条和速度/剩余时间"""
+        self.progress_bar['value'] = done / total * 100 if total else 100
+        remaining = f"{eta:.0f}s" if eta is not None else "--"
+        self.progress_text.set(f"{done}/{total} | {rate:.1f} 个/秒 | 剩余 {remaining}")
+    
+    def _cancel(self):
+        """请求取消当前任务(在下一项处理前停止)"""
+        if self.running and not self.cancel_event.is_set():
+            self.cancel_event.set()
+            self._log("⚠ 正在取消...")
+    
+    def _log_cancelled(self, progress):
+        """输出取消提示"""
+        if progress.cancelled:
+            self._log(f"⚠ 任务已取消, 已处理: {progress.done}/{progress.total}")
     
     def _validate_and_start(self, callback, *args):
         """验证输入并启动任务"""
@@ -135,9 +172,20 @@ class RenamerApp:
         self.run_btn.configure(state=DISABLED)
         self.preview_btn.configure(state=DISABLED)
         self.eng_to_cn_btn.configure(state=DISABLED)
+        self.detect_btn.configure(state=DISABLED)
+        self.cancel_btn.configure(state=NORMAL)
+        self.cancel_event.clear()
+        self.progress_bar['value'] = 0
+        self.progress_text.set('')
         self.running = True
         self.mapper.cache.clear()
-        threading.Thread(target=callback, args=(*args, threshold), daemon=True).start()
+        self.profiler = RunProfiler(callback.__name__.strip('_'))
+        threading.Thread(target=self._run_task, args=(callback, *args, threshold), daemon=True).start()
+    
+    def _run_task(self, callback, *args):
+        """任务线程入口(在本线程内启动分阶段计时)"""
+        self.profiler.start()
+        callback(*args)
     
     def _start_preview(self):
         """启动预览模式"""
@@ -181,13 +229,21 @@ class RenamerApp:
         
         self._validate_and_start(self._rename_roms_eng_to_cn, folder, platform)
     
+    def _start_detect(self):
+        """启动平台自动检测"""
+        folder = self.folder_var.get().strip()
+        if not folder or not os.path.isdir(folder):
+            self._log("错误:请选择有效的ROM文件夹")
+            return
+        self._validate_and_start(self._detect_platform, folder)
+    
     def _start_lpl(self):
         """启动LPL转换"""
         lpl_path = self.lpl_var.get().strip()
         if not lpl_path or not os.path.exists(lpl_path):
             self._log("错误:请选择有效的LPL文件")
             return
-        self._validate_and_start(self._convert_lpl, lpl_path)
+        self._validate_and_start(self._convert_lpl, lpl_path, bool(self.thumb_var.get()))
     
     def _start_xml(self):
         """启动XML转换"""
@@ -197,6 +253,32 @@ class RenamerApp:
             return
         self._validate_and_start(self._convert_xml, xml_path)
     
+    def _detect_platform(self, folder, threshold):
+        """抽样检测ROM文件夹所属平台"""
+        from time import time
+        start = time()
+        self._log("=" * 70)
+        self._log("开始自动检测平台...")
+        
+        try:
+            platform, hits, sampled = detect_platform(self.mapper, folder, cancel=self.cancel_event)
+            if self.cancel_event.is_set():
+                self._log(f"⚠ 检测已取消, 已抽样: {sampled} 个文件,未修改平台")
+            elif platform:
+                self.platform_var.set(platform)
+                self._log(f"✓ 检测结果: {platform}")
+            else:
+                self._log("✗ 未能识别平台,请手动选择")
+            
+            self._log(f"完成! 耗时: {time()-start:.1f}s | 抽样: {sampled} 个文件")
+            for name, count in sorted(hits.items(), key=lambda kv: kv[1], reverse=True):
+                if count:
+                    self._log(f"  • {name}: {count} 个高置信度命中")
+        except Exception as e:
+            self._log(f"✗ 检测失败: {e}")
+        
+        self._finish()
+    
     def _preview_roms(self, folder, platform, threshold):
         """预览重命名效果(不实际修改)"""
         from time import time
@@ -220,33 +302,35 @@ class RenamerApp:
         
         stats = {'total': 0, 'will_rename': 0, 'skipped': 0, 'english': 0, 'wrong_ext': 0, 'errors': 0}
         
-        for filename in os.listdir(folder):
-            if not os.path.isfile(os.path.join(folder, filename)):
-                continue
-            
-            stats['total'] += 1
-            name, ext = os.path.splitext(filename)
+        # 扫描文件(多碟/多文件镜像按集合分组)
+        with self.profiler.stage('scan'):
+            rom_sets, stats['total'], stats['wrong_ext'] = scan_rom_sets(
+                folder, valid_extensions, self.mapper.is_multi_file(platform))
+        
+        progress = ProgressTracker(len(rom_sets), self._progress)
+        for rom_set in progress.iterate(rom_sets, self.cancel_event):
+            name, filename = rom_set['base'], rom_set['label']
             
             try:
-                # 检查扩展名是否匹配
-                if ext.lower() not in valid_extensions:
-                    stats['wrong_ext'] += 1
-                    continue
-                
                 # 跳过英文文件
                 if not is_chinese_filename(name):
                     stats['english'] += 1
                     continue
                 
                 # 匹配预览
-                mapping = self.mapper.load_mapping(csv_path)
-                cleaned = FileNameCleaner.clean(name)
-                match, score = SmartMatcher.match(cleaned, mapping['cn_list'], threshold)
+                with self.profiler.stage('csv_load'):
+                    mapping = self.mapper.load_mapping(csv_path)
+                with self.profiler.stage('clean'):
+                    cleaned = FileNameCleaner.clean(name)
+                with self.profiler.stage('match'):
+                    match, score = SmartMatcher.match(cleaned, mapping['cn_list'], threshold)
                 
                 if match and (eng := mapping['cn_to_eng'].get(match)):
-                    new_name = generate_unique_filename(folder, eng + ext)
+                    with self.profiler.stage('rename_io'):
+                        plan = plan_set_rename(folder, rom_set, eng)
+                    new_names = "".join(f"\n  → {new}" for new in plan.values())
                     stats['will_rename'] += 1
-                    self._log(f"✓ [预览] {filename}\n  → {new_name}\n  [分数: {score:.1f}]")
+                    self._log(f"✓ [预览] {filename}{new_names}\n  [分数: {score:.1f}]")
                 else:
                     stats['skipped'] += 1
                     self._log(f"✗ 将跳过: {filename} (分数:{score:.1f})")
@@ -257,6 +341,7 @@ class RenamerApp:
         
         # 输出统计
         self._log("=" * 70)
+        self._log_cancelled(progress)
         self._log(f"预览完成! 耗时: {time()-start:.1f}s")
         self._log(f"总计: {stats['total']} | 将重命名: {stats['will_rename']} | 跳过英文: {stats['english']}")
         self._log(f"将跳过: {stats['skipped']} | 错误扩展名: {stats['wrong_ext']} | 错误: {stats['errors']}")
@@ -287,34 +372,36 @@ class RenamerApp:
         
         stats = {'total': 0, 'renamed': 0, 'skipped': 0, 'english': 0, 'wrong_ext': 0, 'errors': 0}
         
-        for filename in os.listdir(folder):
-            if not os.path.isfile(os.path.join(folder, filename)):
-                continue
-            
-            stats['total'] += 1
-            name, ext = os.path.splitext(filename)
+        # 扫描文件(多碟/多文件镜像按集合分组)
+        with self.profiler.stage('scan'):
+            rom_sets, stats['total'], stats['wrong_ext'] = scan_rom_sets(
+                folder, valid_extensions, self.mapper.is_multi_file(platform))
+        
+        progress = ProgressTracker(len(rom_sets), self._progress)
+        for rom_set in progress.iterate(rom_sets, self.cancel_event):
+            name, filename = rom_set['base'], rom_set['label']
             
             try:
-                # 检查扩展名是否匹配
-                if ext.lower() not in valid_extensions:
-                    stats['wrong_ext'] += 1
-                    continue
-                
                 # 跳过英文文件
                 if not is_chinese_filename(name):
                     stats['english'] += 1
                     continue
                 
                 # 匹配并重命名
-                mapping = self.mapper.load_mapping(csv_path)
-                cleaned = FileNameCleaner.clean(name)
-                match, score = SmartMatcher.match(cleaned, mapping['cn_list'], threshold)
+                with self.profiler.stage('csv_load'):
+                    mapping = self.mapper.load_mapping(csv_path)
+                with self.profiler.stage('clean'):
+                    cleaned = FileNameCleaner.clean(name)
+                with self.profiler.stage('match'):
+                    match, score = SmartMatcher.match(cleaned, mapping['cn_list'], threshold)
                 
                 if match and (eng := mapping['cn_to_eng'].get(match)):
-                    new_name = generate_unique_filename(folder, eng + ext)
-                    os.rename(os.path.join(folder, filename), os.path.join(folder, new_name))
+                    with self.profiler.stage('rename_io'):
+                        plan = plan_set_rename(folder, rom_set, eng)
+                        rename_rom_set(folder, rom_set, plan)
+                    new_names = "".join(f"\n  → {new}" for new in plan.values())
                     stats['renamed'] += 1
-                    self._log(f"✓ {filename}\n  → {new_name}\n  [分数: {score:.1f}]")
+                    self._log(f"✓ {filename}{new_names}\n  [分数: {score:.1f}]")
                 else:
                     stats['skipped'] += 1
                     self._log(f"✗ 跳过: {filename} (分数:{score:.1f})")
@@ -325,6 +412,7 @@ class RenamerApp:
         
         # 输出统计
         self._log("=" * 70)
+        self._log_cancelled(progress)
         self._log(f"完成! 耗时: {time()-start:.1f}s")
         self._log(f"总计: {stats['total']} | 成功: {stats['renamed']} | 跳过英文: {stats['english']}")
         self._log(f"未匹配: {stats['skipped']} | 错误扩展名: {stats['wrong_ext']} | 错误: {stats['errors']}")
@@ -356,37 +444,36 @@ class RenamerApp:
         
         stats = {'total': 0, 'renamed': 0, 'skipped': 0, 'chinese': 0, 'wrong_ext': 0, 'errors': 0}
         
-        for filename in os.listdir(folder):
-            if not os.path.isfile(os.path.join(folder, filename)):
-                continue
-            
-            stats['total'] += 1
-            name, ext = os.path.splitext(filename)
+        # 扫描文件(多碟/多文件镜像按集合分组)
+        with self.profiler.stage('scan'):
+            rom_sets, stats['total'], stats['wrong_ext'] = scan_rom_sets(
+                folder, valid_extensions, self.mapper.is_multi_file(platform))
+        
+        progress = ProgressTracker(len(rom_sets), self._progress)
+        for rom_set in progress.iterate(rom_sets, self.cancel_event):
+            name, filename = rom_set['base'], rom_set['label']
             
             try:
-                # 检查扩展名是否匹配
-                if ext.lower() not in valid_extensions:
-                    stats['wrong_ext'] += 1
-                    continue
-                
                 # 跳过中文文件
                 if is_chinese_filename(name):
                     stats['chinese'] += 1
                     continue
                 
                 # 匹配并重命名(英译中)
-                mapping = self.mapper.load_mapping(csv_path)
-                cleaned = FileNameCleaner.clean(name)
+                with self.profiler.stage('csv_load'):
+                    mapping = self.mapper.load_mapping(csv_path)
                 
-                # 使用eng_to_cn映射
-                eng_list = list(mapping['eng_to_cn'].keys())
-                match, score = SmartMatcher.match(cleaned, eng_list, threshold)
+                # 使用eng_to_cn映射(按区域/语言标签筛选候选)
+                with self.profiler.stage('match'):
+                    match, score = SmartMatcher.match_eng(name, mapping, threshold)
                 
                 if match and (cn := mapping['eng_to_cn'].get(match)):
-                    new_name = generate_unique_filename(folder, cn + ext)
-                    os.rename(os.path.join(folder, filename), os.path.join(folder, new_name))
+                    with self.profiler.stage('rename_io'):
+                        plan = plan_set_rename(folder, rom_set, cn)
+                        rename_rom_set(folder, rom_set, plan)
+                    new_names = "".join(f"\n  → {new}" for new in plan.values())
                     stats['renamed'] += 1
-                    self._log(f"✓ {filename}\n  → {new_name}\n  [分数: {score:.1f}]")
+                    self._log(f"✓ {filename}{new_names}\n  [分数: {score:.1f}]")
                 else:
                     stats['skipped'] += 1
                     self._log(f"✗ 跳过: {filename} (分数:{score:.1f})")
@@ -397,6 +484,7 @@ class RenamerApp:
         
         # 输出统计
         self._log("=" * 70)
+        self._log_cancelled(progress)
         self._log(f"完成! 耗时: {time()-start:.1f}s")
         self._log(f"总计: {stats['total']} | 成功: {stats['renamed']} | 跳过中文: {stats['chinese']}")
         self._log(f"未匹配: {stats['skipped']} | 错误扩展名: {stats['wrong_ext']} | 错误: {stats['errors']}")
@@ -405,15 +493,15 @@ class RenamerApp:
         
         self._finish()
     
-    def _convert_lpl(self, lpl_path, threshold):
-        """转换LPL播放列表"""
+    def _convert_lpl(self, lpl_path, link_thumbs, threshold):
+        """转换LPL播放列表(可选为新标签关联缩略图)"""
         from time import time
         start = time()
         self._log("=" * 70)
         self._log(f"开始转换LPL: {Path(lpl_path).name}")
         
         try:
-            with open(lpl_path, 'r', encoding='utf-8') as f:
+            with self.profiler.stage('playlist_io'), open(lpl_path, 'r', encoding='utf-8') as f:
                 lpl = json.load(f)
             
             if 'items' not in lpl:
@@ -423,9 +511,11 @@ class RenamerApp:
             
             stats = {'total': len(lpl['items']), 'converted': 0, 'skipped': 0, 'no_match': 0}
             platform_stats = {}
+            renames = []
             
             # 尝试从所有平台配置中匹配
-            for item in lpl['items']:
+            progress = ProgressTracker(len(lpl['items']), self._progress)
+            for item in progress.iterate(lpl['items'], self.cancel_event):
                 label = item.get('label', '')
                 ext = Path(item.get('path', '')).suffix.lower()
                 
@@ -450,31 +540,35 @@ class RenamerApp:
                 platform_stats[csv_name] = platform_stats.get(csv_name, 0) + 1
                 
                 # 匹配中文名
-                mapping = self.mapper.load_mapping(csv_path)
-                cleaned = FileNameCleaner.clean(label)
-                best_match, best_score = None, 0
+                with self.profiler.stage('csv_load'):
+                    mapping = self.mapper.load_mapping(csv_path)
+                with self.profiler.stage('match'):
+                    best_match, best_score = SmartMatcher.match_label(label, mapping, threshold)
                 
-                for eng, cn in mapping['eng_to_cn'].items():
-                    if cn:
-                        score = fuzz.token_set_ratio(cleaned, FileNameCleaner.clean(eng))
-                        if score > best_score:
-                            best_score, best_match = score, cn
-                
-                if best_match and best_score >= threshold:
+                if best_match:
                     item['label'] = best_match
+                    db_name = item.get('db_name') or Path(lpl_path).name
+                    renames.append((Path(db_name).stem, label, best_match))
                     stats['converted'] += 1
                     self._log(f"✓ {label}\n  → {best_match} [{matched_platform}, {best_score:.1f}]")
                 else:
                     stats['skipped'] += 1
                     self._log(f"⊙ 保持: {label} ({best_score:.1f})")
             
+            # 取消时不保存不完整的列表
+            if progress.cancelled:
+                self._log_cancelled(progress)
+                self._log("未保存任何文件")
+                self._finish()
+                return
+            
             # 保存到桌面
             desktop = Path.home() / "Desktop"
             clean_name = Path(lpl_path).name.replace('_', ' ')
             clean_name = re.sub(r'\[.*?\]', '', clean_name).strip()
             save_path = desktop / clean_name
             
-            with open(save_path, 'w', encoding='utf-8') as f:
+            with self.profiler.stage('playlist_io'), open(save_path, 'w', encoding='utf-8') as f:
                 json.dump(lpl, f, ensure_ascii=False, indent=2)
             
             self._log("=" * 70)
@@ -482,6 +576,17 @@ class RenamerApp:
             self._log(f"总计: {stats['total']} | 已转换: {stats['converted']} | 保持: {stats['skipped']} | 无匹配: {stats['no_match']}")
             self._log(f"已保存到桌面: {clean_name}")
             
+            # RetroArch目录结构: playlists/*.lpl 与 thumbnails/ 同级
+            if link_thumbs and renames:
+                thumbnail_dir = Path(lpl_path).parent.parent / "thumbnails"
+                if thumbnail_dir.is_dir():
+                    with self.profiler.stage('rename_io'):
+                        thumb_stats = link_thumbnails(thumbnail_dir, renames)
+                    self._log(f"封面关联: 硬链接 {thumb_stats['linked']} | 符号链接 {thumb_stats['symlinked']} | "
+                              f"已存在 {thumb_stats['exists']} | 缺失 {thumb_stats['missing']} | 失败 {thumb_stats['failed']}")
+                else:
+                    self._log(f"⚠ 未找到缩略图目录: {thumbnail_dir}")
+            
             if platform_stats:
                 self._log("\n使用的CSV统计:")
                 for csv, count in sorted(platform_stats.items()):
@@ -502,12 +607,15 @@ class RenamerApp:
         self._log(f"开始转换萤火虫XML: {Path(xml_path).name}")
         
         try:
-            tree, root = parse_xml_playlist(xml_path)
+            with self.profiler.stage('playlist_io'):
+                tree, root = parse_xml_playlist(xml_path)
             
             stats = {'total': 0, 'converted': 0, 'skipped': 0, 'no_match': 0}
             platform_stats = {}
             
-            for game in root.findall('game'):
+            games = root.findall('game')
+            progress = ProgressTracker(len(games), self._progress)
+            for game in progress.iterate(games, self.cancel_event):
                 name_elem = game.find('name')
                 path_elem = game.find('path')
                 
@@ -539,17 +647,12 @@ class RenamerApp:
                 platform_stats[csv_name] = platform_stats.get(csv_name, 0) + 1
                 
                 # 匹配中文名
-                mapping = self.mapper.load_mapping(csv_path)
-                cleaned = FileNameCleaner.clean(label)
-                best_match, best_score = None, 0
+                with self.profiler.stage('csv_load'):
+                    mapping = self.mapper.load_mapping(csv_path)
+                with self.profiler.stage('match'):
+                    best_match, best_score = SmartMatcher.match_label(label, mapping, threshold)
                 
-                for eng, cn in mapping['eng_to_cn'].items():
-                    if cn:
-                        score = fuzz.token_set_ratio(cleaned, FileNameCleaner.clean(eng))
-                        if score > best_score:
-                            best_score, best_match = score, cn
-                
-                if best_match and best_score >= threshold:
+                if best_match:
                     name_elem.text = best_match
                     stats['converted'] += 1
                     self._log(f"✓ {label}\n  → {best_match} [{matched_platform}, {best_score:.1f}]")
@@ -557,12 +660,20 @@ class RenamerApp:
                     stats['skipped'] += 1
                     self._log(f"⊙ 保持: {label} ({best_score:.1f})")
             
+            # 取消时不保存不完整的列表
+            if progress.cancelled:
+                self._log_cancelled(progress)
+                self._log("未保存任何文件")
+                self._finish()
+                return
+            
             # 保存到桌面
             desktop = Path.home() / "Desktop"
             save_name = Path(xml_path).name
             save_path = desktop / save_name
             
-            save_xml_playlist(tree, save_path)
+            with self.profiler.stage('playlist_io'):
+                save_xml_playlist(tree, save_path)
             
             self._log("=" * 70)
             self._log(f"完成! 耗时: {time()-start:.1f}s")
@@ -581,10 +692,23 @@ class RenamerApp:
     
     def _finish(self):
         """完成任务"""
+        if self.profiler:
+            profiler, self.profiler = self.profiler, None
+            profiler.stop()
+            try:
+                path = profiler.save()
+                self._log("\n各阶段耗时:")
+                for line in profiler.summary_lines():
+                    self._log(line)
+                self._log(f"分析报告: {path}")
+            except OSError as e:
+                self._log(f"⚠ 保存分析报告失败: {e}")
         self.running = False
         self.run_btn.configure(state=NORMAL)
         self.preview_btn.configure(state=NORMAL)
         self.eng_to_cn_btn.configure(state=NORMAL)
+        self.detect_btn.configure(state=NORMAL)
+        self.cancel_btn.configure(state=DISABLED)
 
 
 if __name__ == '__main__':
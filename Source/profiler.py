@@ -0,0 +1,150 @@
+"""
+ROM Renamer - 运行分析
+按阶段统计耗时(次数/总计/分位数),可选cProfile和tracemalloc,结果写入JSON报告;
+以及长任务的进度/速度/剩余时间汇报
+"""
+import json
+import math
+import cProfile
+import tracemalloc
+from time import perf_counter
+from datetime import datetime
+from pathlib import Path
+from contextlib import contextmanager
+
+from config import PROFILE_REPORT_DIR, PROFILE_CPROFILE, PROFILE_TRACEMALLOC, PROGRESS_INTERVAL
+
+# 阶段显示名
+STAGE_NAMES = {
+    'scan': '目录扫描',
+    'clean': '文件名清理',
+    'csv_load': 'CSV加载',
+    'match': '模糊匹配',
+    'rename_io': '重命名IO',
+    'log': '日志输出',
+    'playlist_io': '列表读写',
+}
+
+
+def _percentile(ordered, p):
+    """最近秩分位数(ordered需已排序)"""
+    return ordered[max(0, math.ceil(p * len(ordered)) - 1)]
+
+
+class RunProfiler:
+    """单次任务的分阶段计时"""
+    def __init__(self, task, cprofile=PROFILE_CPROFILE, trace_memory=PROFILE_TRACEMALLOC):
+        self.task = task
+        self.timings = {}  # 阶段 -> 每次耗时(秒)
+        self.profile = cProfile.Profile() if cprofile else None
+        self.trace_memory = trace_memory
+        self.started = self.total = None
+        self.memory_peak = None
+    
+    def start(self):
+        """开始计时(需在任务线程中调用,cProfile只分析当前线程)"""
+        if self.trace_memory:
+            tracemalloc.start()
+        if self.profile:
+            self.profile.enable()
+        self.started = perf_counter()
+    
+    def stop(self):
+        """结束计时"""
+        self.total = perf_counter() - self.started
+        if self.profile:
+            self.profile.disable()
+        if self.trace_memory:
+            self.memory_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    
+    @contextmanager
+    def stage(self, name):
+        """统计一个阶段的一次耗时"""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.timings.setdefault(name, []).append(perf_counter() - start)
+    
+    def report(self):
+        """生成报告字典(耗时单位:毫秒)"""
+        stages = {}
+        for name, samples in self.timings.items():
+            ordered = sorted(samples)
+            stages[name] = {
+                'count': len(ordered),
+                'total_ms': round(sum(ordered) * 1000, 3),
+                'p50_ms': round(_percentile(ordered, 0.5) * 1000, 3),
+                'p95_ms': round(_percentile(ordered, 0.95) * 1000, 3),
+                'max_ms': round(ordered[-1] * 1000, 3)
+            }
+        report = {
+            'task': self.task,
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'total_ms': round((self.total or 0) * 1000, 3),
+            'stages': stages,
+            'other_ms': round(((self.total or 0) - sum(map(sum, self.timings.values()))) * 1000, 3)
+        }
+        if self.memory_peak is not None:
+            report['memory_peak_bytes'] = self.memory_peak
+        return report
+    
+    def save(self, report_dir=None):
+        """写入JSON报告(启用cProfile时另存.prof),返回报告路径"""
+        folder = Path(report_dir) if report_dir else Path(__file__).parent / PROFILE_REPORT_DIR
+        folder.mkdir(parents=True, exist_ok=True)
+        path = folder / f"{self.task}_{datetime.now():%Y%m%d_%H%M%S}.json"
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+        if self.profile:
+            self.profile.dump_stats(str(path.with_suffix('.prof')))
+        return path
+    
+    def summary_lines(self):
+        """按耗时排序的各阶段摘要"""
+        report = self.report()
+        lines = []
+        for name, s in sorted(report['stages'].items(), key=lambda kv: kv[1]['total_ms'], reverse=True):
+            share = s['total_ms'] / report['total_ms'] * 100 if report['total_ms'] else 0
+            lines.append(f"  • {STAGE_NAMES.get(name, name)}: {s['total_ms'] / 1000:.2f}s ({share:.0f}%) | "
+                         f"{s['count']} 次 | p50 {s['p50_ms']:.2f}ms | p95 {s['p95_ms']:.2f}ms")
+        if 'memory_peak_bytes' in report:
+            lines.append(f"  • 内存峰值: {report['memory_peak_bytes'] / 1024 / 1024:.1f}MB")
+        return lines
+
+
+class ProgressTracker:
+    """进度汇报(限制刷新频率),支持协作式取消"""
+    def __init__(self, total, callback, interval=PROGRESS_INTERVAL):
+        self.total = total
+        self.callback = callback  # callback(已处理, 总数, 每秒数量, 剩余秒数)
+        self.interval = interval
+        self.done = 0
+        self.cancelled = False
+        self.started = perf_counter()
+        self.last_report = None
+    
+    def update(self, done, force=False):
+        """更新已处理数量,距上次汇报不足interval时跳过"""
+        self.done = done
+        now = perf_counter()
+        if not force and self.last_report is not None and now - self.last_report < self.interval:
+            return
+        self.last_report = now
+        elapsed = now - self.started
+        rate = done / elapsed if elapsed > 0 else 0
+        eta = (self.total - done) / rate if rate else None
+        self.callback(done, self.total, rate, eta)
+    
+    def iterate(self, items, cancel=None):
+        """遍历items并汇报进度,cancel(threading.Event)被置位时在下一项前停止"""
+        done = 0
+        for item in items:
+            if cancel is not None and cancel.is_set():
+                self.cancelled = True
+                break
+            self.update(done)
+            yield item
+            done += 1
+        self.update(done, force=True)
@@ -0,0 +1,173 @@
+"""
+ROM Renamer - 本地查询服务
+常驻加载所有平台索引，通过HTTP(仅本机)或Unix套接字提供批量中英文名查询
+用法: python server.py [--port 8765 | --unix /tmp/rom-renamer.sock]
+
+POST /match  {"threshold": 40, "queries": [{"platform": "PlayStation", "name": "最终幻想7", "direction": "cn2en"}]}
+GET  /stats  请求延迟与吞吐统计
+"""
+import os
+import sys
+import stat
+import json
+import time
+import argparse
+import threading
+import socketserver
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import PLATFORM_CONFIG, DEFAULT_THRESHOLD, SERVER_HOST, SERVER_PORT, SERVER_LATENCY_WINDOW
+from core import CSVMapper, SmartMatcher
+from profiler import _percentile
+
+
+class LookupService:
+    """常驻索引的批量查询服务"""
+    def __init__(self):
+        self.mapper = CSVMapper()
+        self.mappings = {}
+        for platform_name in PLATFORM_CONFIG:
+            csv_path = self.mapper.get_csv_path(platform_name)
+            if csv_path:
+                self.mappings[platform_name] = self.mapper.load_mapping(csv_path)
+        
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counters = {'requests': 0, 'queries': 0, 'errors': 0, 'busy_seconds': 0.0}
+        self.latencies = deque(maxlen=SERVER_LATENCY_WINDOW)
+    
+    def match_batch(self, queries, threshold=DEFAULT_THRESHOLD):
+        """批量查询,每条返回 {name, match, score} 或 {error}"""
+        results = []
+        for query in queries:
+            try:
+                mapping = self.mappings.get(query.get('platform'))
+                if mapping is None:
+                    raise ValueError(f"未知平台: {query.get('platform')}")
+                name, match, score = SmartMatcher.translate(
+                    query.get('name', ''), mapping, query.get('direction', 'cn2en'), threshold)
+                results.append({'name': name, 'match': match, 'score': round(score, 1)})
+            except Exception as e:
+                results.append({'error': str(e)})
+        return results
+    
+    def record(self, queries, seconds, error=False):
+        """记录一次请求的统计"""
+        with self.lock:
+            self.counters['requests'] += 1
+            self.counters['queries'] += queries
+            self.counters['errors'] += int(error)
+            self.counters['busy_seconds'] += seconds
+            self.latencies.append(seconds)
+    
+    def stats(self):
+        """延迟(毫秒)与吞吐统计"""
+        with self.lock:
+            counters = dict(self.counters)
+            latencies = sorted(self.latencies)
+        uptime = time.time() - self.started
+        
+        def percentile(p):
+            return round(_percentile(latencies, p) * 1000, 2) if latencies else 0
+        
+        busy = counters.pop('busy_seconds')
+        return {
+            **counters,
+            'uptime_s': round(uptime, 1),
+            'latency_ms': {'p50': percentile(0.5), 'p95': percentile(0.95), 'p99': percentile(0.99),
+                           'max': round(latencies[-1] * 1000, 2) if latencies else 0},
+            'queries_per_s': round(counters['queries'] / uptime, 1) if uptime else 0,
+            'queries_per_busy_s': round(counters['queries'] / busy, 1) if busy else 0,
+            'platforms': sorted(self.mappings)
+        }
+
+
+class LookupHandler(BaseHTTPRequestHandler):
+    """HTTP请求处理"""
+    service = None
+    
+    def do_GET(self):
+        if self.path == '/stats':
+            self._reply(200, self.service.stats())
+        else:
+            self._reply(404, {'error': '未知路径'})
+    
+    def do_POST(self):
+        if self.path != '/match':
+            self._reply(404, {'error': '未知路径'})
+            return
+        start = time.perf_counter()
+        queries = []
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            queries = body.get('queries', [])
+            if not isinstance(queries, list):
+                raise ValueError("queries必须为列表")
+            threshold = int(body.get('threshold', DEFAULT_THRESHOLD))
+            results = self.service.match_batch(queries, threshold)
+        except Exception as e:
+            self.service.record(len(queries), time.perf_counter() - start, error=True)
+            self._reply(400, {'error': str(e)})
+            return
+        elapsed = time.perf_counter() - start
+        self.service.record(len(queries), elapsed)
+        self._reply(200, {'results': results, 'elapsed_ms': round(elapsed * 1000, 2)})
+    
+    def _reply(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def address_string(self):
+        # Unix套接字没有客户端地址
+        return self.client_address[0] if self.client_address else 'unix'
+    
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix套接字上的HTTP服务"""
+    daemon_threads = True
+
+
+def create_server(service, port=SERVER_PORT, unix_path=None):
+    """创建服务(只绑定本机回环地址或Unix套接字)"""
+    handler = type('Handler', (LookupHandler,), {'service': service})
+    if unix_path:
+        # 只清理上次遗留的套接字,不删除其他文件
+        if os.path.exists(unix_path):
+            if not stat.S_ISSOCK(os.stat(unix_path).st_mode):
+                raise FileExistsError(f"路径已存在且不是套接字: {unix_path}")
+            os.remove(unix_path)
+        return ThreadingUnixHTTPServer(unix_path, handler)
+    return ThreadingHTTPServer((SERVER_HOST, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地ROM名称批量查询服务")
+    parser.add_argument('--port', type=int, default=SERVER_PORT, help=f"监听端口(仅{SERVER_HOST})")
+    parser.add_argument('--unix', metavar='PATH', help="改为监听Unix套接字")
+    args = parser.parse_args(argv)
+    
+    start = time.time()
+    service = LookupService()
+    server = create_server(service, args.port, args.unix)
+    print(f"已加载 {len(service.mappings)} 个平台, 耗时: {time.time()-start:.1f}s")
+    print(f"监听: {args.unix or f'http://{SERVER_HOST}:{args.port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.unix and os.path.exists(args.unix) and stat.S_ISSOCK(os.stat(args.unix).st_mode):
+            os.remove(args.unix)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
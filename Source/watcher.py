@@ -0,0 +1,269 @@
+"""
+ROM Renamer - 监视模式
+常驻内存保持CSV索引，监视ROM文件夹并自动重命名新到达的文件
+用法: python watcher.py 文件夹=平台 [...] [--mode cn2en|en2cn] [--threshold 40]
+"""
+import os
+import sys
+import time
+import select
+import struct
+import ctypes
+import logging
+import argparse
+from logging.handlers import RotatingFileHandler
+
+from config import (PLATFORM_CONFIG, DEFAULT_THRESHOLD, WATCH_DEBOUNCE, WATCH_SETTLE, WATCH_POLL_INTERVAL,
+                    WATCH_SET_TIMEOUT, WATCH_NEEDS_SHEET, WATCH_LOG_FILE, WATCH_LOG_MAX_BYTES, WATCH_LOG_BACKUPS)
+from core import (CSVMapper, SmartMatcher, SHEET_EXTENSIONS, is_chinese_filename, scan_rom_sets,
+                  read_sheet_references, plan_set_rename, rename_rom_set)
+
+# inotify事件
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_ISDIR = 0x40000000
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyBackend:
+    """基于inotify的文件事件(仅Linux)"""
+    def __init__(self, folders):
+        libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1失败")
+        self.folders = {}
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        for folder in folders:
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(folder), mask)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"无法监视: {folder}")
+            self.folders[wd] = folder
+    
+    def wait(self, timeout):
+        """等待事件,返回[(文件夹, 文件名, 是否已写完)]"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events, offset = [], 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if name and wd in self.folders and not mask & IN_ISDIR:
+                events.append((self.folders[wd], name, bool(mask & (IN_CLOSE_WRITE | IN_MOVED_TO))))
+        return events
+
+
+class PollingBackend:
+    """轮询目录快照(inotify不可用时)"""
+    def __init__(self, folders):
+        self.snapshots = {folder: self._snapshot(folder) for folder in folders}
+    
+    @staticmethod
+    def _snapshot(folder):
+        snapshot = {}
+        try:
+            for entry in os.scandir(folder):
+                if entry.is_file():
+                    stat = entry.stat()
+                    snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            # 文件夹暂时不可访问:视为空,恢复后重新上报
+            pass
+        return snapshot
+    
+    def wait(self, timeout):
+        """等待并比较快照,返回[(文件夹, 文件名, 是否已写完)]"""
+        time.sleep(min(timeout, WATCH_POLL_INTERVAL))
+        events = []
+        for folder, old in self.snapshots.items():
+            new = self._snapshot(folder)
+            events.extend((folder, name, False) for name, state in new.items() if old.get(name) != state)
+            self.snapshots[folder] = new
+        return events
+
+
+class RomWatcher:
+    """监视ROM文件夹,新文件稳定后按任务配置重命名"""
+    def __init__(self, jobs, threshold=DEFAULT_THRESHOLD, logger=None, polling=False):
+        self.jobs = {job['folder']: job for job in jobs}
+        self.threshold = threshold
+        self.logger = logger or logging.getLogger(__name__)
+        self.mapper = CSVMapper()
+        self.pending = {}  # (文件夹, 文件名) -> 到期时间
+        self.first_seen = {}  # (文件夹, 文件名) -> 首次事件时间
+        
+        # 预热:常驻加载各平台映射
+        for job in jobs:
+            csv_path = self.mapper.get_csv_path(job['platform'])
+            if not csv_path:
+                raise ValueError(f"未找到平台 {job['platform']} 的CSV文件")
+            job['mapping'] = self.mapper.load_mapping(csv_path)
+            job['extensions'] = self.mapper.get_platform_extensions(job['platform'])
+        
+        self.backend = None
+        if not polling and sys.platform.startswith('linux'):
+            try:
+                self.backend = InotifyBackend(self.jobs)
+                self.logger.info("使用inotify监视: %s", ', '.join(self.jobs))
+            except (OSError, AttributeError, TypeError) as e:
+                self.logger.info("inotify不可用(%s),改为轮询", e)
+        if self.backend is None:
+            self.backend = PollingBackend(self.jobs)
+            self.logger.info("使用轮询监视: %s", ', '.join(self.jobs))
+    
+    def run_forever(self):
+        """主循环"""
+        while True:
+            self.poll()
+    
+    def poll(self):
+        """处理一轮事件并执行到期的重命名"""
+        now = time.monotonic()
+        timeout = min(self.pending.values(), default=now + WATCH_POLL_INTERVAL) - now
+        for folder, name, closed in self.backend.wait(max(timeout, 0)):
+            # 写入完成的文件只需短暂等待,其余需等到不再变化;
+            # 多文件平台的同组文件可能陆续到达,始终按WATCH_DEBOUNCE等待
+            multi_file = self.mapper.is_multi_file(self.jobs[folder]['platform'])
+            now = time.monotonic()
+            self.pending[(folder, name)] = now + (WATCH_SETTLE if closed and not multi_file else WATCH_DEBOUNCE)
+            self.first_seen.setdefault((folder, name), now)
+        
+        now = time.monotonic()
+        due = [key for key, deadline in self.pending.items() if deadline <= now]
+        by_folder = {}
+        for key in due:
+            del self.pending[key]
+            if os.path.isfile(os.path.join(*key)):
+                by_folder.setdefault(key[0], set()).add(key[1])
+            else:
+                self.first_seen.pop(key, None)
+        for folder, names in by_folder.items():
+            try:
+                self.process(self.jobs[folder], names)
+            except Exception as e:
+                self.logger.error("✗ 处理失败: %s - %s", folder, e)
+            # 已处理(无论是否重命名)的文件不再跟踪,被推迟的文件保留首次时间以计算超时
+            for name in names:
+                if (folder, name) not in self.pending:
+                    self.first_seen.pop((folder, name), None)
+    
+    def _defer_incomplete(self, folder, rom_set, arrived):
+        """多文件集合未到齐时推迟处理,返回是否已推迟"""
+        # 同组文件仍在写入:等它到期时一并处理
+        deadlines = [self.pending[(folder, f)] for f in rom_set['files'] if (folder, f) in self.pending]
+        if deadlines:
+            for f in arrived:
+                self.pending[(folder, f)] = max(deadlines)
+            return True
+        
+        sheets = [f for f in rom_set['files'] if os.path.splitext(f)[1].lower() in SHEET_EXTENSIONS]
+        reason = None
+        try:
+            present = {f.lower() for f in os.listdir(folder)}
+            for sheet in sheets:
+                missing = [ref for ref in read_sheet_references(os.path.join(folder, sheet))
+                           if ref.lower() not in present]
+                if missing:
+                    reason = f"{sheet} 引用的 {missing[0]} 尚未到达"
+                    break
+        except OSError as e:
+            # 索引文件被删除或暂时不可读:视为尚未到齐
+            reason = f"无法读取: {e}"
+        if not sheets and any(os.path.splitext(f)[1].lower() in WATCH_NEEDS_SHEET for f in rom_set['files']):
+            reason = "cue/gdi/m3u尚未到达"
+        if not reason:
+            return False
+        
+        now = time.monotonic()
+        first = min(self.first_seen.get((folder, f), now) for f in arrived)
+        if now - first >= WATCH_SET_TIMEOUT:
+            self.logger.info("⚠ %s: %s, 已等待%.0fs,按现有文件处理", rom_set['label'], reason, now - first)
+            return False
+        for f in arrived:
+            self.pending[(folder, f)] = now + WATCH_DEBOUNCE
+        self.logger.debug("等待集合完整: %s (%s)", rom_set['label'], reason)
+        return True
+    
+    def process(self, job, names):
+        """重命名包含新文件的ROM集合"""
+        start = time.perf_counter()
+        folder, mapping = job['folder'], job['mapping']
+        multi_file = self.mapper.is_multi_file(job['platform'])
+        rom_sets, _, _ = scan_rom_sets(folder, job['extensions'], multi_file)
+        for rom_set in rom_sets:
+            arrived = names.intersection(rom_set['files'])
+            if not arrived:
+                continue
+            name = rom_set['base']
+            # 已是目标语言的集合(包括本程序刚重命名的)无需等待和处理
+            needs_rename = is_chinese_filename(name) == (job['mode'] == 'cn2en')
+            if needs_rename and multi_file and self._defer_incomplete(folder, rom_set, arrived):
+                continue
+            if not needs_rename:
+                continue
+            try:
+                title, _, score = SmartMatcher.translate(name, mapping, job['mode'], self.threshold)
+                
+                if not title:
+                    self.logger.info("✗ 跳过: %s (分数:%.1f)", rom_set['label'], score)
+                    continue
+                plan = plan_set_rename(folder, rom_set, title)
+                rename_rom_set(folder, rom_set, plan)
+                for old, new in plan.items():
+                    self.logger.info("✓ %s → %s [分数: %.1f]", old, new, score)
+            except Exception as e:
+                self.logger.error("✗ 错误: %s - %s", rom_set['label'], e)
+        self.logger.debug("处理 %d 个新文件, 耗时 %.1fms", len(names), (time.perf_counter() - start) * 1000)
+
+
+def setup_logger(log_path=WATCH_LOG_FILE):
+    """配置轮转文件日志和控制台输出"""
+    logger = logging.getLogger('watcher')
+    logger.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('[%(asctime)s] %(levelname)s %(message)s', '%Y-%m-%d %H:%M:%S')
+    file_handler = RotatingFileHandler(log_path, maxBytes=WATCH_LOG_MAX_BYTES,
+                                       backupCount=WATCH_LOG_BACKUPS, encoding='utf-8')
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    for handler in (file_handler, console_handler):
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+    return logger
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="监视ROM文件夹并自动重命名新文件")
+    parser.add_argument('jobs', nargs='+', metavar='文件夹=平台',
+                        help=f"可多个,平台: {', '.join(PLATFORM_CONFIG)}")
+    parser.add_argument('--mode', choices=['cn2en', 'en2cn'], default='cn2en', help="cn2en=中译英, en2cn=英译中")
+    parser.add_argument('--threshold', type=int, default=DEFAULT_THRESHOLD, help="匹配阈值 (0-100)")
+    parser.add_argument('--log', default=WATCH_LOG_FILE, help="日志文件路径")
+    parser.add_argument('--poll', action='store_true', help="强制使用轮询")
+    args = parser.parse_args(argv)
+    
+    jobs = []
+    for spec in args.jobs:
+        folder, _, platform = spec.rpartition('=')
+        if not os.path.isdir(folder) or platform not in PLATFORM_CONFIG:
+            parser.error(f"无效的任务: {spec}")
+        jobs.append({'folder': os.path.abspath(folder), 'platform': platform, 'mode': args.mode})
+    
+    logger = setup_logger(args.log)
+    watcher = RomWatcher(jobs, args.threshold, logger, polling=args.poll)
+    try:
+        watcher.run_forever()
+    except KeyboardInterrupt:
+        logger.info("已停止监视")
+
+
+if __name__ == '__main__':
+    sys.exit(main())